@@ -0,0 +1,154 @@
+import sys
+import time
+import heapq
+import argparse
+import numpy as np
+import graph
+
+"""
+Benchmark of node expansions on long-corridor maps.
+
+Compares the bidirectional search (Graph.bidirectional_escape_path) with unidirectional searches using the same cost
+model on "comb" buildings: a long corridor along the top with narrow rooms hanging off it, the start at the back of the
+first room and the exit at the back of the last one. For each cost model (safestar and a_star) it runs:
+ dijkstra = unidirectional search with no heuristic
+ one-way A* = unidirectional A* with the same exit bound the bidirectional potential is built from
+              (Graph.exit_heuristic)
+ bidirectional = Graph.bidirectional_escape_path
+ the original planner = safest_escape_path or regular_a_star, for reference
+Prints one row per map and planner with the number of expanded nodes, the path length, the path cost in the planner's
+cost model and the search time. The note column flags rows that returned no path or a path costlier than dijkstra's;
+their expansion counts are not comparable with the others.
+
+Usage:
+ python benchmark.py [--sizes 31 61 91] [--room 3]
+"""
+
+
+"""
+Inputs: integer for size of grid and the width of each room
+Output: (obstacles, exits, shooters, start) for a comb map: a 2 wide corridor along the top and 1 wide walls every
+        room + 1 columns below it, the start at the bottom of the first room, the exit at the bottom of the last room
+        and a shooter in the middle of the building
+"""
+def comb_map(size: int, room: int = 3):
+    corridor = 2
+    obstacles = [[[corridor, y], size - corridor, 1] for y in range(room, size - 1, room + 1)]
+    exits = [[size - 1, size - 1]]
+    shooters = [[size // 2, size // 2]]
+    start = [size - 1, 0]
+    return obstacles, exits, shooters, start
+
+
+"""
+Inputs: graph, [x,y] start coordinate, the cost model, "safestar" or "a_star", and whether to use the exit heuristic
+Output: (path, expansions) for a unidirectional A* (Dijkstra without the heuristic) from the start to any exit over
+        the same edge costs as Graph.bidirectional_escape_search
+"""
+def one_way_search(planning_graph: graph.Graph, start, planner: str, heuristic: bool):
+    if planner == "safestar":
+        if planning_graph.edge_cost is None:
+            planning_graph.edge_cost_update()
+        edge_cost = planning_graph.edge_cost
+    else:
+        edge_cost = np.ones(len(planning_graph.edge_targets), dtype=np.float32)
+    exit_ids = [int(planning_graph.grid[x][y]) for x, y in planning_graph.exits]
+    exit_ids = set(exit_id for exit_id in exit_ids if exit_id != 0)
+    if heuristic:
+        h_exit = planning_graph.exit_heuristic(list(exit_ids), planner)
+    else:
+        def h_exit(node_id):
+            return 0.0
+    edge_offsets = planning_graph.edge_offsets
+    edge_targets = planning_graph.edge_targets
+
+    start_id = int(planning_graph.grid[start[0]][start[1]])
+    cost = {start_id: 0.0}
+    backpointer = {start_id: 0}
+    queue = [(h_exit(start_id), 0.0, start_id)]
+    closed = set()
+    exit_id = 0
+    while queue:
+        node_cost, node_id = heapq.heappop(queue)[1:]
+        if node_id in closed:
+            continue
+        closed.add(node_id)
+        if node_id in exit_ids:
+            exit_id = node_id
+            break
+        first, last = edge_offsets[node_id - 1], edge_offsets[node_id]
+        for neighbor_id, move_cost in zip(edge_targets[first:last].tolist(), edge_cost[first:last].tolist()):
+            new_cost = node_cost + move_cost
+            if new_cost < cost.get(neighbor_id, float('inf')):
+                cost[neighbor_id] = new_cost
+                backpointer[neighbor_id] = node_id
+                heapq.heappush(queue, (new_cost + h_exit(neighbor_id), new_cost, neighbor_id))
+
+    path = []
+    while exit_id != 0:
+        path.append(exit_id)
+        exit_id = backpointer[exit_id]
+    path.reverse()
+    return path, len(closed)
+
+
+def run(size: int, room: int):
+    obstacles, exits, shooters, start = comb_map(size, room)
+    planning_graph = graph.Graph(size, obstacles, exits)
+    planning_graph.graph_initialize()
+    planning_graph.node_get_neighbors()
+    planning_graph.node_set_d_exit()
+    planning_graph.shooter_wavefront(shooters)
+
+    def with_expansions(planner):
+        def search(s):
+            path = planner(s)
+            return path, planning_graph.expansions
+        return search
+
+    rows = []
+    for cost_model, original_name, original in [('safestar', 'safest_escape_path', planning_graph.safest_escape_path),
+                                                ('a_star', 'regular_a_star', planning_graph.regular_a_star)]:
+        planners = [('dijkstra', lambda s: one_way_search(planning_graph, s, cost_model, False)),
+                    ('one-way A*', lambda s: one_way_search(planning_graph, s, cost_model, True)),
+                    ('bidirectional', with_expansions(
+                        lambda s: planning_graph.bidirectional_escape_path(s, cost_model))),
+                    (original_name, with_expansions(original))]
+        optimal = None
+        for name, planner in planners:
+            tic = time.perf_counter()
+            path, expansions = planner(start)
+            toc = time.perf_counter()
+            if cost_model == 'safestar':
+                cost = sum(planning_graph.next_cost(a, b) for a, b in zip(path, path[1:]))
+            else:
+                cost = max(0, len(path) - 1)
+            if optimal is None:
+                optimal = cost
+            if not path:
+                note = 'no path'
+            elif cost > optimal + 1e-6:
+                note = 'suboptimal'
+            else:
+                note = ''
+            rows.append((size, len(planning_graph.nodes), cost_model, name, expansions, len(path), cost,
+                         (toc - tic) * 1000, note))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Count node expansions on long-corridor maps.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[31, 61, 91], help="grid sizes to run")
+    parser.add_argument('--room', type=int, default=3, help="room width")
+    args = parser.parse_args(argv)
+
+    print("%5s %6s %-9s %-19s %10s %6s %7s %10s  %s" %
+          ('size', 'nodes', 'cost', 'planner', 'expansions', 'length', 'cost', 'ms', 'note'))
+    for size in args.sizes:
+        for row in run(size, args.room):
+            print("%5d %6d %-9s %-19s %10d %6d %7.1f %10.1f  %s" % row)
+    sys.stdout.flush()
+
+
+if __name__ == '__main__':
+    main()
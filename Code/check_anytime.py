@@ -0,0 +1,58 @@
+import sys
+import glob
+import argparse
+import safestar
+
+"""
+Check of the anytime search against Safe* on scenario files.
+
+For every start in each scenario, runs safest_escape_path and anytime_escape_path until it converges and compares the
+smallest safety value along the two paths. The anytime path must be at least as safe as the Safe* path and must have
+converged with a bound of 1. Prints one row per start and exits with status 1 if any start fails.
+
+Usage:
+ python check_anytime.py [scenarios/figure1.json ...]
+"""
+
+
+"""
+Input: scenario dict from safestar.load_scenario
+Output: list of (scenario, start, Safe* length, Safe* min safety, anytime length, anytime min safety, bound, ok) rows
+"""
+def check_scenario(scenario: dict) -> list:
+    planning_graph = safestar.build_graph(scenario)
+
+    def min_safety(path):
+        return min([planning_graph.nodes[node_id - 1].safety for node_id in path], default=float('nan'))
+
+    rows = []
+    for start in scenario['starts']:
+        safe_path = planning_graph.safest_escape_path(start)
+        anytime_path, bound, search = planning_graph.anytime_escape_path(start, None)
+        ok = search.done and bound == 1.0 and bool(anytime_path) == bool(safe_path)
+        if safe_path and anytime_path:
+            ok = ok and min_safety(anytime_path) >= min_safety(safe_path)
+        rows.append((scenario['name'], start, len(safe_path), min_safety(safe_path), len(anytime_path),
+                     min_safety(anytime_path), bound, ok))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check that anytime Safe* paths are as safe as Safe*'s.")
+    parser.add_argument('scenarios', nargs='*', help="scenario JSON file(s), default scenarios/figure*.json")
+    args = parser.parse_args(argv)
+
+    paths = args.scenarios or sorted(glob.glob('scenarios/figure*.json'))
+    print("%-26s %-10s %8s %8s %8s %8s %6s  %s" %
+          ('scenario', 'start', 'safe len', 'safe min', 'any len', 'any min', 'bound', 'result'))
+    failed = False
+    for path in paths:
+        for row in check_scenario(safestar.load_scenario(path)):
+            print("%-26s %-10s %8d %8g %8d %8g %6.2f  %s" % (row[:7] + ('ok' if row[7] else 'FAIL',)))
+            failed = failed or not row[7]
+    sys.stdout.flush()
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,7 +1,9 @@
+import os
 import sys
 import pygame
 from pygame.locals import KEYDOWN, K_q
 import graph
+import safestar
 
 """
 Original Pygame grid visualization code by Keno Leon:
@@ -14,13 +16,16 @@ row = x
 column = y
 
 To use with Safe* and A* search:
- Inputs:
+ Usage:
+ python draw_visualization.py [scenario.json]   (defaults to scenarios/figure3.json)
+
+ Inputs (read from the scenario file, see safestar.py):
  size: an integer for the (square) grid side length
  obstacles: a list of coordinates describing the shape of obstacles in the format (from top left) 
             [[topleftx, toplefty], verticalheightdown = int, horizontal_width_right = int]
  exits = List of [x,y] coordinates of exit(s)
- shooters = List of [x,y] coordinates of shooter(s)
- start = [x,y] coordinate of start location
+ hazards = List of [x,y] coordinates of shooter(s)
+ starts = List of [x,y] start coordinates, the first one is drawn
  
  Output:
  The grid with:
@@ -44,187 +49,63 @@ ORANGE = (255, 140, 0)
 GREY = (160, 160, 160)
 
 # 2D GRID MAP:
-
-# FIGURE 1 - Safe Exit
-# 9x9 Small Grid Demonstration
-# Comment out this section to the next comment to change visualization
-"""obstacles = [[[1, 1], 1, 3],
-             [[1, 1], 4, 1],
-             [[3, 3], 2, 1],
-             [[1, 5], 4, 1],
-             [[1, 7], 1, 2],
-             [[4, 7], 1, 2],
-             [[6, 0], 1, 5],
-             [[6, 4], 2, 1],
-             [[6, 6], 1, 3],
-             [[8, 6], 1, 1]]
-exits = [[3, 8], [8, 0]]
-shooters = [[0, 6]]
-size = 9
-start = [1, 4]"""
-# Comment to here
-
-# FIGURE 2 - Safe Exit
-# 13x13 Medium Grid Demonstration
-# Comment out this section to the next comment to change visualization
-"""obstacles = [[[1, 1], 3, 1],
-                 [[1, 3], 1, 3],
-                 [[1, 6], 4, 1],
-                 [[1, 8], 2, 1],
-                 [[1, 10], 1, 2],
-                 [[1, 11], 4, 1],
-                 [[4, 3], 1, 4],
-                 [[4, 8], 1, 4],
-                 [[6, 0], 1, 3],
-                 [[6, 4], 6, 1],
-                 [[6, 6], 4, 1],
-                 [[6, 8], 1, 4],
-                 [[6, 11], 3, 1],
-                 [[9, 0], 2, 3],
-                 [[9, 6], 1, 6],
-                 [[11, 6], 2, 1],
-                 [[11, 6], 1, 3],
-                 [[11, 10], 1, 3],
-                 [[12, 2], 1, 1]]
-exits = [[8, 0], [5, 12]]
-shooters = [[0, 11]]
-size = 13
-start = [8, 10]"""
-# Comment to here
-
-# FIGURE 3 - Safe Exit
-# 13x13 Medium Grid Demonstration
-# Comment out this section to the next comment to change visualization
-obstacles = [[[1, 1], 3, 1],
-                 [[1, 3], 1, 3],
-                 [[1, 6], 4, 1],
-                 [[1, 8], 2, 1],
-                 [[1, 10], 1, 2],
-                 [[1, 11], 4, 1],
-                 [[4, 3], 1, 4],
-                 [[4, 8], 1, 4],
-                 [[6, 0], 1, 3],
-                 [[6, 4], 6, 1],
-                 [[6, 6], 4, 1],
-                 [[6, 8], 1, 4],
-                 [[6, 11], 3, 1],
-                 [[9, 0], 2, 3],
-                 [[9, 6], 1, 6],
-                 [[11, 6], 2, 1],
-                 [[11, 6], 1, 3],
-                 [[11, 10], 1, 3],
-                 [[12, 2], 1, 1]]
-exits = [[0, 6], [5, 0], [12, 5], [5, 12]]
-shooters = [[3, 12], [3, 0]]
-size = 13
-start = [8, 10]
-# Comment to here
-
-# FIGURE 4 - Too many shooters example
-# 13x13 Medium Grid Demonstration
-# Comment out this section to the next comment to change visualization
-"""obstacles = [[[1, 1], 3, 1],
-                 [[1, 3], 1, 3],
-                 [[1, 6], 4, 1],
-                 [[1, 8], 2, 1],
-                 [[1, 10], 1, 2],
-                 [[1, 11], 4, 1],
-                 [[4, 3], 1, 4],
-                 [[4, 8], 1, 4],
-                 [[6, 0], 1, 3],
-                 [[6, 4], 6, 1],
-                 [[6, 6], 4, 1],
-                 [[6, 8], 1, 4],
-                 [[6, 11], 3, 1],
-                 [[9, 0], 2, 3],
-                 [[9, 6], 1, 6],
-                 [[11, 6], 2, 1],
-                 [[11, 6], 1, 3],
-                 [[11, 10], 1, 3],
-                 [[12, 2], 1, 1]]
-exits = [[0, 6], [5, 0], [12, 5], [5, 12]]
-shooters = [[9, 12], [3, 0], [0, 8], [12, 3]]
-size = 13
-start = [8, 10]"""
-# Comment to here
-
-# FIGURE 5 - Exits too far away example
-# 13x13 Medium Grid Demonstration
-# Comment out this section to the next comment to change visualization
-"""obstacles = [[[1, 1], 3, 1],
-                 [[1, 3], 1, 3],
-                 [[1, 6], 4, 1],
-                 [[1, 8], 2, 1],
-                 [[1, 10], 1, 2],
-                 [[1, 11], 4, 1],
-                 [[4, 3], 1, 4],
-                 [[4, 8], 1, 4],
-                 [[6, 0], 1, 3],
-                 [[6, 4], 6, 1],
-                 [[6, 6], 4, 1],
-                 [[6, 8], 1, 4],
-                 [[6, 11], 3, 1],
-                 [[9, 0], 2, 3],
-                 [[9, 6], 1, 6],
-                 [[11, 6], 2, 1],
-                 [[11, 6], 1, 3],
-                 [[11, 10], 1, 3],
-                 [[12, 2], 1, 1]]
-exits = [[12, 0], [0, 0], [5, 12]]
-shooters = [[0, 11]]
-size = 13
-start = [1, 9]"""
-# Comment to here
-
-
-# initialize graph
-graph.graph = graph.Graph(size, obstacles, exits)
-graph.graph.graph_initialize()
-graph.graph.node_get_neighbors()
-graph.graph.node_set_d_exit()
-graph.graph.shooter_wavefront(shooters)
-# Find Safe* path
-safest_shortest_path = graph.graph.safest_escape_path(start)
-
-# Find A* path
-a_star_shortest_path = graph.graph.regular_a_star(start)
-
-# Create copy of grid for visualization
-cellMAP = graph.grid_construct(size, obstacles)
-
-# Mark all Safe* path locations
-for node in safest_shortest_path:
-    coordinate = graph.graph.nodes[node-1].coords
-    cellMAP[coordinate[0]][coordinate[1]] = 2
-
-# Mark all A* path locations
-for node in a_star_shortest_path:
-    coordinate = graph.graph.nodes[node-1].coords
-    cellMAP[coordinate[0]][coordinate[1]] = 3
-
-# Mark shooter locations
-for shooter in shooters:
-    if type(shooter) == list:
-        cellMAP[shooter[0]][shooter[1]] = 4
-    else:
-        cellMAP[shooter] = 4
-
-# Mark the start location
-cellMAP[start[0]][start[1]] = 5
-
-# Mark Exits
-for location in exits:
-    if type(location) == list:
-        cellMAP[location[0]][location[1]] = 6
-    else:
-        cellMAP[location] = 6
-
+# The figures live in scenarios/figure1.json - figure5.json, pass one on the command line to change visualization
+DEFAULT_SCENARIO = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'scenarios', 'figure3.json')
 
 _VARS = {'surf': False, 'gridWH': 400,
-         'gridOrigin': (200, 100), 'gridCells': cellMAP.shape[0], 'lineWidth': 2}
+         'gridOrigin': (200, 100), 'gridCells': 0, 'lineWidth': 2, 'cellMAP': None}
 
 
-def main():
+"""
+Inputs: scenario dict (see safestar.load_scenario), the Graph built for it, the start coordinate and the Safe* and A*
+        paths as lists of node_ids
+Output: a copy of the grid with path, hazard, start and exit cells marked for placeCells
+"""
+def build_cell_map(scenario, planning_graph, start, safest_shortest_path, a_star_shortest_path):
+    # Create copy of grid for visualization
+    cellMAP = graph.grid_construct(scenario['size'], scenario['obstacles'])
+
+    # Mark all Safe* path locations
+    for node in safest_shortest_path:
+        coordinate = planning_graph.nodes[node-1].coords
+        cellMAP[coordinate[0]][coordinate[1]] = 2
+
+    # Mark all A* path locations
+    for node in a_star_shortest_path:
+        coordinate = planning_graph.nodes[node-1].coords
+        cellMAP[coordinate[0]][coordinate[1]] = 3
+
+    # Mark shooter locations
+    for shooter in scenario['hazards']:
+        if type(shooter) == list:
+            cellMAP[shooter[0]][shooter[1]] = 4
+        else:
+            cellMAP[shooter] = 4
+
+    # Mark the start location
+    cellMAP[start[0]][start[1]] = 5
+
+    # Mark Exits
+    for location in scenario['exits']:
+        if type(location) == list:
+            cellMAP[location[0]][location[1]] = 6
+        else:
+            cellMAP[location] = 6
+    return cellMAP
+
+
+# Plan the Safe* and A* paths from the scenario's first start and draw them until the window is closed
+def show_scenario(scenario):
+    planning_graph = safestar.build_graph(scenario)
+    start = scenario['starts'][0]
+    # Find Safe* path
+    safest_shortest_path = planning_graph.safest_escape_path(start)
+    # Find A* path
+    a_star_shortest_path = planning_graph.regular_a_star(start)
+
+    _VARS['cellMAP'] = build_cell_map(scenario, planning_graph, start, safest_shortest_path, a_star_shortest_path)
+    _VARS['gridCells'] = _VARS['cellMAP'].shape[0]
+
     pygame.init()
     _VARS['surf'] = pygame.display.set_mode(SCREENSIZE)
     while True:
@@ -236,11 +117,16 @@ def main():
         pygame.display.update()
 
 
+def main():
+    show_scenario(safestar.load_scenario(sys.argv[1] if len(sys.argv) > 1 else DEFAULT_SCENARIO))
+
+
 # NEW METHOD FOR ADDING CELLS :
 def placeCells():
     # GET CELL DIMENSIONS...
     cellBorder = 6
     celldimX = celldimY = (_VARS['gridWH']/_VARS['gridCells']) - (cellBorder*2)
+    cellMAP = _VARS['cellMAP']
     # Color the squares with correct colors
     for row in range(cellMAP.shape[0]):
         for column in range(cellMAP.shape[1]):
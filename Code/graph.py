@@ -1,5 +1,11 @@
 import sys
 import time
+import heapq
+import array
+import threading
+import os
+import multiprocessing
+from multiprocessing import shared_memory
 import numpy as np
 import collections
 from queue import PriorityQueue
@@ -49,6 +55,23 @@ class Graph:
         self.grid = grid_construct(size, obstacles)
         self.nodes = []
         self.exits = exits
+        # Adjacency in compressed form: the edges leaving node_id are edge_offsets[node_id-1]:edge_offsets[node_id]
+        # in edge_targets, in the same order as node.neighbors. edge_cost holds the Safe* cost of each of those edges.
+        self.edge_offsets = None
+        self.edge_targets = None
+        self.edge_reverse = None
+        self.edge_cost = None
+        # Safe* edge costs towards one chosen exit, by exit index, filled in on demand by exit_edge_cost
+        self.exit_edge_costs = {}
+        # Largest smallest safety over the routes from each node to an exit, filled in on demand by escape_safety_update
+        self.escape_safety = None
+        # Number of nodes expanded by the last search
+        self.expansions = 0
+        # (hazards x nodes) wavefront distances from each hazard, filled in by hazard_wavefront
+        self.hazard_layers = None
+        # True while safety is a plain wavefront distance (whole numbers that change by at most 1 per move). The
+        # heuristics used for the anytime and bidirectional Safe* bounds rely on it.
+        self.unit_safety = True
 
     """
     Output: The modified grid and a graph represented as a list of nodes which in turn represent the free spaces
@@ -98,6 +121,18 @@ class Graph:
             if nodeY != 0 and self.grid[nodeX][nodeY - 1] != 0:
                 node.neighbors.append(self.grid[nodeX][nodeY - 1])
 
+        degrees = [len(node.neighbors) for node in self.nodes]
+        self.edge_offsets = np.zeros(len(self.nodes) + 1, dtype=np.int32)
+        np.cumsum(degrees, out=self.edge_offsets[1:])
+        self.edge_targets = np.array([n for node in self.nodes for n in node.neighbors], dtype=np.int32)
+        # edge_reverse[e] is the index of the edge going the opposite way to edge e
+        sources = np.repeat(np.arange(1, len(self.nodes) + 1), degrees)
+        edge_keys = sources * (len(self.nodes) + 1) + self.edge_targets
+        order = np.argsort(edge_keys)
+        reverse_keys = self.edge_targets.astype(np.int64) * (len(self.nodes) + 1) + sources
+        self.edge_reverse = order[np.searchsorted(edge_keys[order], reverse_keys)].astype(np.int32)
+        self.edge_cost = None
+
     """
     Output: Updated d_exit values for nodes in the graph
 
@@ -110,10 +145,13 @@ class Graph:
                 d_exit = distance_manhattan(node.coords, element)
                 if d_exit < node.d_exit:
                     node.d_exit = d_exit
+        self.edge_cost = None
+        self.exit_edge_costs = {}
+        self.escape_safety = None
 
     """
     Inputs: A list of shooter[x,y] coordinates
-    Output: the graph with updated safety attribute for each node
+    Output: the graph with updated safety attribute for each node, edge_cost and escape_safety
     """
     def shooter_wavefront(self, shooter_coordinates: list[list[int()]]):
 
@@ -125,6 +163,7 @@ class Graph:
                     shooter_locations.append(node.node_id)
                     break
 
+        changed = set(shooter_locations)
         for shooter in shooter_locations:
             Q = Queue()
             self.nodes[shooter - 1].safety = 0
@@ -140,9 +179,162 @@ class Graph:
                     if neighbor_id not in closed:
                         if self.nodes[neighbor_id - 1].safety > wavefront:
                             self.nodes[neighbor_id - 1].safety = wavefront
+                            changed.add(neighbor_id)
                         if not Q.is_member(neighbor_id):
                             Q.enque(neighbor_id)
 
+        self.edge_cost_update(list(changed))
+        self.escape_safety_update()
+
+    """
+    Inputs: A list of hazard [x,y] coordinates, an optional list of weights (one per hazard) and the number of worker
+            processes (defaults to one per CPU)
+    Output: hazard_layers, an (hazards x nodes) array holding the wavefront distance from each hazard to every node,
+            and the safety attribute of each node set to the smallest distance / weight over all hazards, with edge_cost
+            and escape_safety updated to match
+
+    A weight above 1 makes a hazard count as closer than it is (e.g. an armed shooter), a weight below 1 as further
+    away (e.g. a slow moving fire). Without weights the safety values are the same as shooter_wavefront's. The layers
+    are computed by a process pool whose workers read the adjacency from, and write their layer into, shared memory.
+    """
+    def hazard_wavefront(self, hazard_coordinates: list, weights: list = None, processes: int = None):
+        hazards = np.asarray(hazard_coordinates, dtype=int).reshape(-1, 2)
+        hazard_ids = self.grid[hazards[:, 0], hazards[:, 1]]
+        if np.any(hazard_ids == 0):
+            raise ValueError("hazard coordinates must be free cells, got an obstacle at " +
+                             str(hazards[np.argmax(hazard_ids == 0)].tolist()))
+        if weights is not None and len(weights) != len(hazard_ids):
+            raise ValueError("expected one weight per hazard")
+
+        if processes is None:
+            processes = os.cpu_count() or 1
+        processes = min(processes, len(hazard_ids))
+        if processes <= 1:
+            self.hazard_layers = np.empty((len(hazard_ids), len(self.nodes)), dtype=np.int64)
+            for row, hazard_id in enumerate(hazard_ids):
+                wavefront_layer(self.edge_offsets, self.edge_targets, hazard_id, self.hazard_layers[row])
+        else:
+            self.hazard_layers = self._hazard_layers_parallel(hazard_ids, processes)
+
+        if len(hazard_ids) == 0:
+            safety = np.full(len(self.nodes), sys.maxsize, dtype=np.int64)
+        elif weights is None or all(weight == 1 for weight in weights):
+            safety = self.hazard_layers.min(axis=0)
+        else:
+            safety = (self.hazard_layers / np.asarray(weights, dtype=float)[:, None]).min(axis=0)
+        self.unit_safety = safety.dtype.kind == 'i'
+
+        changed = []
+        for node, node_safety in zip(self.nodes, safety.tolist()):
+            if node.safety != node_safety:
+                node.safety = node_safety
+                changed.append(node.node_id)
+        self.edge_cost_update(changed)
+        self.escape_safety_update()
+
+    # Compute one wavefront layer per hazard in a process pool sharing the adjacency and the output through shared memory
+    def _hazard_layers_parallel(self, hazard_ids, processes: int):
+        n_nodes = len(self.nodes)
+        n_edges = len(self.edge_targets)
+        adjacency = shared_memory.SharedMemory(create=True, size=max(1, 4 * (n_nodes + 1 + n_edges)))
+        layers = shared_memory.SharedMemory(create=True, size=max(1, 8 * len(hazard_ids) * n_nodes))
+        try:
+            shared_adjacency = np.ndarray((n_nodes + 1 + n_edges,), dtype=np.int32, buffer=adjacency.buf)
+            shared_adjacency[:n_nodes + 1] = self.edge_offsets
+            shared_adjacency[n_nodes + 1:] = self.edge_targets
+            with multiprocessing.Pool(processes, _hazard_worker_init,
+                                      (adjacency.name, layers.name, n_nodes, n_edges, len(hazard_ids))) as pool:
+                pool.map(_hazard_worker, enumerate(hazard_ids.tolist()))
+            result = np.ndarray((len(hazard_ids), n_nodes), dtype=np.int64, buffer=layers.buf).copy()
+            del shared_adjacency
+        finally:
+            adjacency.close()
+            adjacency.unlink()
+            layers.close()
+            layers.unlink()
+        return result
+
+    # Return the d_exit and safety attributes of all nodes as float arrays indexed by node_id-1
+    def node_arrays(self):
+        d_exit = np.array([node.d_exit for node in self.nodes], dtype=float)
+        safety = np.array([node.safety for node in self.nodes], dtype=float)
+        return d_exit, safety
+
+    """
+    Input: optional list of node_ids whose safety changed since edge_cost was last computed
+    Output: edge_cost with the next_cost value of every directed edge, as a float32 array aligned with edge_targets
+
+    Computes every edge if edge_cost has not been built yet (or no list is given), otherwise only recomputes the edges
+    that start or end at a changed node.
+    """
+    def edge_cost_update(self, changed_nodes: list = None):
+        d_exit, safety = self.node_arrays()
+        sources = np.repeat(np.arange(len(self.nodes)), np.diff(self.edge_offsets))
+        targets = self.edge_targets - 1
+
+        if self.edge_cost is None or changed_nodes is None:
+            self.edge_cost = np.empty(len(self.edge_targets), dtype=np.float32)
+            edges = np.arange(len(self.edge_targets))
+        else:
+            changed = np.zeros(len(self.nodes), dtype=bool)
+            changed[np.asarray(changed_nodes, dtype=int) - 1] = True
+            edges = np.flatnonzero(changed[sources] | changed[targets])
+
+        self.edge_cost[edges] = next_cost_classes(d_exit[sources[edges]], safety[sources[edges]],
+                                                  d_exit[targets[edges]], safety[targets[edges]])
+        self.exit_edge_costs = {}
+        self.escape_safety = None
+
+    """
+    Input: index of an exit in self.exits
+    Output: float32 array aligned with edge_targets holding next_cost of every edge with d_exit replaced by the manhattan
+    distance to that exit, i.e. the Safe* cost of moving towards this exit rather than the nearest one
+    """
+    def exit_edge_cost(self, exit_index: int):
+        if exit_index not in self.exit_edge_costs:
+            coords = np.array([node.coords for node in self.nodes]).reshape(-1, 2)
+            d_exit = np.abs(coords - np.asarray(self.exits[exit_index])).sum(axis=1)
+            safety = self.node_arrays()[1]
+            sources = np.repeat(np.arange(len(self.nodes)), np.diff(self.edge_offsets))
+            targets = self.edge_targets - 1
+            self.exit_edge_costs[exit_index] = next_cost_classes(d_exit[sources], safety[sources],
+                                                                 d_exit[targets], safety[targets])
+        return self.exit_edge_costs[exit_index]
+
+    """
+    Output: escape_safety, a float array indexed by node_id-1 holding the largest value s such that an exit can be
+    reached from the node over cells whose safety is all at least s (-inf if no exit can be reached)
+
+    A widest path search from all exits at once: a node's value is the smaller of its own safety and the best value of
+    a neighbor. Values are always one of the safety values, so nodes are settled from the largest value down with one
+    bucket per distinct safety value instead of a heap.
+    """
+    def escape_safety_update(self):
+        levels, rank = np.unique(self.node_arrays()[1], return_inverse=True)
+        rank = rank.reshape(-1).tolist()
+        edge_offsets = self.edge_offsets.tolist()
+        edge_targets = self.edge_targets.tolist()
+        escape = [-1] * len(self.nodes)
+        buckets = [[] for _ in range(len(levels))]
+        for coords in self.exits:
+            exit_id = int(self.grid[coords[0]][coords[1]])
+            if exit_id != 0:
+                escape[exit_id - 1] = rank[exit_id - 1]
+                buckets[rank[exit_id - 1]].append(exit_id)
+        for level in range(len(levels) - 1, -1, -1):
+            bucket = buckets[level]
+            while bucket:
+                node_id = bucket.pop()
+                if escape[node_id - 1] != level:
+                    continue
+                for neighbor_id in edge_targets[edge_offsets[node_id - 1]:edge_offsets[node_id]]:
+                    candidate = min(level, rank[neighbor_id - 1])
+                    if candidate > escape[neighbor_id - 1]:
+                        escape[neighbor_id - 1] = candidate
+                        buckets[candidate].append(neighbor_id)
+        escape = np.asarray(escape)
+        self.escape_safety = np.where(escape >= 0, levels[np.maximum(escape, 0)], -np.inf)
+
     def next_cost(self, currentNode, nextNode):
 
         cost = 2.0
@@ -162,16 +354,33 @@ class Graph:
         return cost
 
     def safest_escape_path(self, start):
+        start_id = int(self.start_node_ids([start])[0])
+        return self.node_path(start_id, self.safest_escape_search(start_id))
+
+    def regular_a_star(self, start):
+        start_id = int(self.start_node_ids([start])[0])
+        return self.node_path(start_id, self.a_star_search(start_id))
+
+    """
+    Input: node_id of the start node and optionally the index of the exit in self.exits to escape through (e.g. from
+           assign_exits)
+    Output: node_id of the exit reached by the Safe* search (0 if no exit can be reached). The path is left in the
+    nodes' backpointers.
+
+    With an exit_index, d_exit is replaced by the manhattan distance to that exit, both in the heuristic and in the edge
+    costs (exit_edge_cost), and only that exit ends the search.
+    """
+    def safest_escape_search(self, start_id: int, exit_index: int = None) -> int:
         pqueue = PriorityQueue()
         closed = []
-        start_id = int
-        exit_id = int
-        path = []
-        # find node_id for matching start node
-        for node in self.nodes:
-            if node.coords == start:
-                start_id = node.node_id
-                break
+        exit_id = 0
+        d_exit, target_id = self.exit_distance(exit_index)
+        if exit_index is not None:
+            edge_cost = self.exit_edge_cost(exit_index)
+        else:
+            if self.edge_cost is None:
+                self.edge_cost_update()
+            edge_cost = self.edge_cost
         self.nodes[start_id - 1].cost = 0
         pqueue.put((0, start_id))
 
@@ -182,41 +391,34 @@ class Graph:
             nbest = self.nodes[nbest_id - 1]
 
             # Check to see if at an exit
-            if nbest.d_exit == 0:
+            if d_exit(nbest) == 0 and (target_id is None or nbest_id == target_id):
                 exit_id = nbest.node_id
                 break
 
-            for neighbor_id in nbest.neighbors:
-                new_cost = nbest.cost + self.next_cost(nbest.node_id, neighbor_id)
+            edge_costs = edge_cost[self.edge_offsets[nbest_id - 1]:self.edge_offsets[nbest_id]].tolist()
+            for neighbor_id, move_cost in zip(nbest.neighbors, edge_costs):
+                new_cost = nbest.cost + move_cost
                 neighbor = self.nodes[neighbor_id - 1]
                 if neighbor_id not in closed or new_cost < neighbor.cost:
                     neighbor.cost = new_cost
-                    heuristic = neighbor.d_exit - neighbor.safety
+                    heuristic = d_exit(neighbor) - neighbor.safety
                     neighbor_priority = new_cost + heuristic
                     neighbor.backpointer = nbest.node_id
-                    if not any(neighbor_id in item for item in pqueue.queue):
+                    if not any(neighbor_id == item[1] for item in pqueue.queue):
                         pqueue.put((neighbor_priority, neighbor_id))
+        self.expansions = len(closed)
+        return exit_id
 
-        path_id = exit_id
-        while path_id != start_id:
-            path.append(path_id)
-            path_id = self.nodes[path_id - 1].backpointer
-
-        path.append(start_id)
-        path.reverse()
-        return path
-
-    def regular_a_star(self, start):
+    """
+    Input: node_id of the start node and optionally the index of the exit in self.exits to escape through
+    Output: node_id of the exit reached by regular A* (0 if no exit can be reached). The path is left in the nodes'
+    backpointers.
+    """
+    def a_star_search(self, start_id: int, exit_index: int = None) -> int:
         pqueue = PriorityQueue()
         closed = []
-        start_id = int
-        exit_id = int
-        path = []
-        # find node_id for matching start node
-        for node in self.nodes:
-            if node.coords == start:
-                start_id = node.node_id
-                break
+        exit_id = 0
+        d_exit, target_id = self.exit_distance(exit_index)
         self.nodes[start_id - 1].cost = 0
         pqueue.put((0, start_id))
 
@@ -227,7 +429,7 @@ class Graph:
             closed.append(nbest.node_id)
 
             # Check to see if at an exit
-            if nbest.d_exit == 0:
+            if d_exit(nbest) == 0 and (target_id is None or nbest_id == target_id):
                 exit_id = nbest.node_id
                 break
 
@@ -237,11 +439,29 @@ class Graph:
 
                 if neighbor_id not in closed or new_cost < neighbor.cost:
                     neighbor.cost = new_cost
-                    neighbor_priority = neighbor.d_exit + new_cost
+                    neighbor_priority = d_exit(neighbor) + new_cost
                     neighbor.backpointer = nbest.node_id
-                    if not any(neighbor_id in item for item in pqueue.queue):
+                    if not any(neighbor_id == item[1] for item in pqueue.queue):
                         pqueue.put((neighbor_priority, neighbor_id))
+        self.expansions = len(closed)
+        return exit_id
 
+    """
+    Input: index of an exit in self.exits, or None for the nearest exit
+    Output: (d_exit, target_id), a function of a node giving its distance to the exit (the node's d_exit when no exit is
+    given) and the node_id of that exit (None when no exit is given, 0 if the exit is not a free cell)
+    """
+    def exit_distance(self, exit_index: int = None):
+        if exit_index is None:
+            return (lambda node: node.d_exit), None
+        coords = self.exits[exit_index]
+        return (lambda node: distance_manhattan(node.coords, coords)), int(self.grid[coords[0]][coords[1]])
+
+    # Follow the backpointers from exit_id back to start_id and return the path as a list of node_ids
+    def node_path(self, start_id: int, exit_id: int) -> list:
+        path = []
+        if exit_id == 0:
+            return path
         path_id = exit_id
         while path_id != start_id:
             path.append(path_id)
@@ -251,6 +471,490 @@ class Graph:
         path.reverse()
         return path
 
+    """
+    Inputs: (N, 2) int array of [x,y] start coordinates, the planner to run, "safestar" or "a_star", and optionally an
+            (N,) array with the index in self.exits each start has to escape through (e.g. from assign_exits, where -1
+            means no exit)
+    Output: (values, offsets) where the path for starts[i] is values[offsets[i]:offsets[i+1]], an int32 array of
+    node_ids from start to exit (empty if no exit can be reached)
+
+    Starts are mapped to node_ids with a single lookup in the grid and repeated starts are only searched once. Each
+    path is written exit first into one flat buffer and all paths are reversed in place at the end. Paths to a given
+    exit come from the same planner searching towards that exit (see safest_escape_search).
+    """
+    def batch_escape_paths(self, starts, planner: str = "safestar", exit_indices=None):
+        if planner == "safestar":
+            search = self.safest_escape_search
+        elif planner == "a_star":
+            search = self.a_star_search
+        else:
+            raise ValueError("planner must be 'safestar' or 'a_star', got " + repr(planner))
+
+        start_ids = self.start_node_ids(starts)
+        if exit_indices is None:
+            targets = [None] * len(start_ids)
+        else:
+            targets = np.asarray(exit_indices, dtype=int).reshape(-1).tolist()
+            if len(targets) != len(start_ids):
+                raise ValueError("expected one exit index per start")
+
+        values = array.array('i')
+        offsets = np.zeros(len(start_ids) + 1, dtype=np.int64)
+        segments = {}
+        for i, (start_id, exit_index) in enumerate(zip(start_ids.tolist(), targets)):
+            if (start_id, exit_index) in segments:
+                begin, end = segments[(start_id, exit_index)]
+                values.extend(values[begin:end])
+            else:
+                begin = len(values)
+                exit_id = 0 if exit_index is not None and exit_index < 0 else search(start_id, exit_index)
+                if exit_id != 0:
+                    path_id = exit_id
+                    while path_id != start_id:
+                        values.append(path_id)
+                        path_id = self.nodes[path_id - 1].backpointer
+                    values.append(start_id)
+                segments[(start_id, exit_index)] = (begin, len(values))
+            offsets[i + 1] = len(values)
+
+        # Reverse every segment: entry j of segment [begin, end) moves to begin + end - 1 - j
+        values = np.frombuffer(values, dtype=np.int32) if len(values) else np.zeros(0, dtype=np.int32)
+        segment = np.repeat(np.arange(len(start_ids)), np.diff(offsets))
+        reverse = offsets[segment] + offsets[segment + 1] - 1 - np.arange(len(values))
+        return values[reverse], offsets
+
+    # Map an (N, 2) array of [x,y] start coordinates to node_ids with a single lookup in the grid
+    def start_node_ids(self, starts):
+        starts = np.asarray(starts, dtype=int).reshape(-1, 2)
+        if starts.size and (starts.min() < 0 or starts.max() >= len(self.grid)):
+            raise ValueError("start coordinates must lie inside the grid")
+        start_ids = self.grid[starts[:, 0], starts[:, 1]]
+        if np.any(start_ids == 0):
+            raise ValueError("start coordinates must be free cells, got an obstacle at " +
+                             str(starts[np.argmax(start_ids == 0)].tolist()))
+        return start_ids
+
+    """
+    Inputs: (N, 2) int array of occupant [x,y] start coordinates, the throughput of each exit in self.exits (the number
+            of occupants it can let out per period, 0 for a closed exit) and the weight of an exit's hazard exposure
+            against walking distance
+    Output: (N,) int array with the index in self.exits each occupant should escape through, to pass to
+            batch_escape_paths (-1 for occupants that can't reach any open exit)
+
+    Occupants on the same cell are grouped. The cost of sending one occupant of a group to an exit is the walking
+    distance from the cell to the exit (a wavefront_layer from each exit) plus safety_weight / (1 + safety) of the exit
+    cell. Every occupant who can reach an open exit is assigned, overcrowded or not: evacuation_rounds gives the fewest
+    periods needed to let everyone out, and each exit can then take that many periods' worth of its throughput (just
+    its throughput when everyone fits in one period). The groups are spread over the exits by exit_assignment, a
+    minimum cost flow that keeps every exit within those limits. On a 201x201 map (39,672 free cells, 6 exits) 60,000 occupants take about 0.3 s with 20% spare
+    capacity and 0.65 s when the capacities add up to exactly the number of occupants. The time grows with the number
+    of distinct start cells and with how tight the capacities are.
+    """
+    def assign_exits(self, starts, capacities: list, safety_weight: float = 10.0):
+        start_ids = self.start_node_ids(starts)
+        capacities = np.asarray(capacities, dtype=np.int64).reshape(-1)
+        if len(capacities) != len(self.exits):
+            raise ValueError("expected one capacity per exit")
+        if np.any(capacities < 0):
+            raise ValueError("exit capacities must not be negative")
+        cells, group = np.unique(start_ids, return_inverse=True)
+        group = group.reshape(-1)
+
+        cost = np.full((len(cells), len(self.exits)), np.inf)
+        layer = np.empty(len(self.nodes), dtype=np.int64)
+        for exit_index, coords in enumerate(self.exits):
+            exit_id = self.grid[coords[0]][coords[1]]
+            if exit_id == 0:
+                continue
+            wavefront_layer(self.edge_offsets, self.edge_targets, exit_id, layer)
+            distance = layer[cells - 1].astype(float)
+            distance[layer[cells - 1] == sys.maxsize] = np.inf
+            cost[:, exit_index] = distance + safety_weight / (1 + self.nodes[exit_id - 1].safety)
+
+        cost[:, capacities == 0] = np.inf
+        supply = np.bincount(group, minlength=len(cells))
+        stranded = np.where(np.isinf(cost).all(axis=1), supply, 0)
+        rounds = evacuation_rounds(cost < np.inf, supply - stranded, capacities)
+        flow = exit_assignment(cost, supply - stranded, rounds * capacities)
+        # Hand each group's exits out to its occupants in order, with -1 as the last column for stranded occupants
+        flow = np.hstack([flow, stranded[:, None]])
+        labels = np.append(np.arange(len(self.exits)), -1)
+        assignment = np.empty(len(group), dtype=np.int64)
+        assignment[np.argsort(group, kind='stable')] = np.repeat(np.tile(labels, len(cells)), flow.reshape(-1))
+        return assignment
+
+    def bidirectional_escape_path(self, start, planner: str = "safestar", exit_index: int = None):
+        start_id = int(self.start_node_ids([start])[0])
+        return self.bidirectional_escape_search(start_id, planner, exit_index)
+
+    """
+    Inputs: node_id of the start node, the cost model to use, "safestar" (next_cost) or "a_star" (1 per move), and
+            optionally the index of the exit in self.exits to escape through (e.g. from assign_exits)
+    Output: a cheapest path from start to any exit, or to the given exit, as a list of node_ids ([] if it can't be
+            reached). With an exit_index the Safe* costs are those of moving towards that exit (exit_edge_cost).
+
+    Bidirectional A*: searches forward from the start and backward from all exits at once, always expanding the side
+    with the smaller reduced queue key. The backward search walks edges in reverse and pays the cost of the forward edge
+    (edge_reverse), since the Safe* cost of a move depends on its direction. Both sides use the average potential
+    p = (h_exit - h_start) / 2 (see escape_potential), which keeps every reduced edge cost non-negative, so the usual
+    bidirectional Dijkstra stopping rule holds: mu is the cheapest start -> exit path seen where the two searches touch,
+    and the search stops once the two smallest queue keys add up to at least mu. The path is spliced once at the end
+    from the two backpointer maps.
+    """
+    def bidirectional_escape_search(self, start_id: int, planner: str = "safestar", exit_index: int = None) -> list:
+        if planner == "safestar" and exit_index is not None:
+            edge_cost = self.exit_edge_cost(exit_index)
+        elif planner == "safestar":
+            if self.edge_cost is None:
+                self.edge_cost_update()
+            edge_cost = self.edge_cost
+        elif planner == "a_star":
+            edge_cost = np.ones(len(self.edge_targets), dtype=np.float32)
+        else:
+            raise ValueError("planner must be 'safestar' or 'a_star', got " + repr(planner))
+        inf = float('inf')
+        edge_offsets = self.edge_offsets
+        edge_targets = self.edge_targets
+        edge_reverse = self.edge_reverse
+
+        exits = self.exits if exit_index is None else [self.exits[exit_index]]
+        exit_ids = [int(self.grid[coords[0]][coords[1]]) for coords in exits]
+        exit_ids = [exit_id for exit_id in exit_ids if exit_id != 0]
+        potential = self.escape_potential(start_id, exit_ids, planner, exit_index)
+        # Shift the keys by the potential of the start and of the virtual node joining all exits so they compare as
+        # distances from either end
+        start_shift = potential(start_id)
+        exit_shift = max([potential(exit_id) for exit_id in exit_ids], default=0.0)
+
+        forward_cost = {start_id: 0.0}
+        forward_backpointer = {start_id: 0}
+        forward_queue = [(start_shift, 0.0, start_id)]
+        backward_cost = {}
+        backward_backpointer = {}
+        backward_queue = []
+        for exit_id in exit_ids:
+            backward_cost[exit_id] = 0.0
+            backward_backpointer[exit_id] = 0
+            backward_queue.append((-potential(exit_id), 0.0, exit_id))
+        heapq.heapify(backward_queue)
+
+        mu = inf
+        meet_id = 0
+        if start_id in backward_cost:
+            mu = 0.0
+            meet_id = start_id
+        self.expansions = 0
+
+        while forward_queue and backward_queue and forward_queue[0][0] + backward_queue[0][0] < mu:
+            forward = forward_queue[0][0] - start_shift <= backward_queue[0][0] + exit_shift
+            if forward:
+                queue, cost, backpointer, other_cost = forward_queue, forward_cost, forward_backpointer, backward_cost
+                sign = 1
+            else:
+                queue, cost, backpointer, other_cost = backward_queue, backward_cost, backward_backpointer, forward_cost
+                sign = -1
+
+            node_cost, node_id = heapq.heappop(queue)[1:]
+            if node_cost > cost[node_id]:
+                continue
+            self.expansions += 1
+
+            first, last = edge_offsets[node_id - 1], edge_offsets[node_id]
+            if forward:
+                edge_costs = edge_cost[first:last].tolist()
+            else:
+                edge_costs = edge_cost[edge_reverse[first:last]].tolist()
+            for neighbor_id, move_cost in zip(edge_targets[first:last].tolist(), edge_costs):
+                new_cost = node_cost + move_cost
+                if new_cost < cost.get(neighbor_id, inf):
+                    cost[neighbor_id] = new_cost
+                    backpointer[neighbor_id] = node_id
+                    heapq.heappush(queue, (new_cost + sign * potential(neighbor_id), new_cost, neighbor_id))
+                if neighbor_id in other_cost and new_cost + other_cost[neighbor_id] < mu:
+                    mu = new_cost + other_cost[neighbor_id]
+                    meet_id = neighbor_id
+
+        path = []
+        if meet_id == 0:
+            return path
+        path_id = meet_id
+        while path_id != 0:
+            path.append(path_id)
+            path_id = forward_backpointer[path_id]
+        path.reverse()
+        path_id = backward_backpointer[meet_id]
+        while path_id != 0:
+            path.append(path_id)
+            path_id = backward_backpointer[path_id]
+        return path
+
+    """
+    Inputs: node_ids of the exits, the cost model, "safestar" or "a_star", and the index of the target exit if the
+            search goes to a single given exit
+    Output: a function of node_id giving h_exit, a consistent lower bound on the cost from that node to the nearest exit
+
+    Below d is d_exit, or the manhattan distance to the target exit when one is given.
+    a_star: h_exit = d.
+    safestar: with phi = d + safety, a move raises phi by at most 2 per unit of cost and lowers it by at most 4/3
+    per unit of cost (a free move lowers d_exit and raises safety by one, leaving phi unchanged). So the cost between two
+    nodes is at least max((phi_to - phi_from) / 2, 0.75 * (phi_from - phi_to)). This needs unit_safety, without it
+    h_exit is 0.
+    """
+    def exit_heuristic(self, exit_ids: list, planner: str = "safestar", exit_index: int = None):
+        nodes = self.nodes
+        if exit_index is None:
+            def d(node):
+                return node.d_exit
+        else:
+            def d(node):
+                return distance_manhattan(node.coords, self.exits[exit_index])
+
+        if planner == "a_star":
+            return lambda node_id: d(nodes[node_id - 1])
+        if not self.unit_safety:
+            return lambda node_id: 0.0
+
+        exit_phis = [d(nodes[exit_id - 1]) + nodes[exit_id - 1].safety for exit_id in exit_ids]
+
+        def h_exit(node_id):
+            node = nodes[node_id - 1]
+            phi = d(node) + node.safety
+            return min([max((exit_phi - phi) / 2, 0.75 * (phi - exit_phi)) for exit_phi in exit_phis], default=0.0)
+        return h_exit
+
+    """
+    Inputs: node_id of the start node, node_ids of the exits, the cost model, "safestar" or "a_star", and the index of
+            the target exit if the search goes to a single given exit
+    Output: a function of node_id giving the average potential (h_exit - h_start) / 2 for bidirectional_escape_search,
+    where h_exit is the bound from exit_heuristic and h_start a consistent lower bound on the cost from the start:
+    the manhattan distance to the start for a_star, and for safestar the same phi bound as h_exit taken from the start
+    (0 without unit_safety).
+    """
+    def escape_potential(self, start_id: int, exit_ids: list, planner: str = "safestar", exit_index: int = None):
+        nodes = self.nodes
+        start = nodes[start_id - 1]
+        h_exit = self.exit_heuristic(exit_ids, planner, exit_index)
+        cache = {}
+        if planner == "a_star":
+            def h_start(node):
+                return distance_manhattan(node.coords, start.coords)
+        elif not self.unit_safety:
+            def h_start(node):
+                return 0.0
+        else:
+            if exit_index is None:
+                start_phi = start.d_exit + start.safety
+            else:
+                start_phi = distance_manhattan(start.coords, self.exits[exit_index]) + start.safety
+
+            def h_start(node):
+                d = node.d_exit if exit_index is None else distance_manhattan(node.coords, self.exits[exit_index])
+                phi = d + node.safety
+                return max((phi - start_phi) / 2, 0.75 * (start_phi - phi))
+
+        def potential(node_id):
+            if node_id not in cache:
+                cache[node_id] = (h_exit(node_id) - h_start(nodes[node_id - 1])) / 2
+            return cache[node_id]
+        return potential
+
+    """
+    Inputs: [x,y] start coordinate, deadline in milliseconds, initial heuristic inflation epsilon and the amount epsilon
+            is lowered by after each completed search iteration
+    Output: (path, bound, search) where path is the best Safe* path found before the deadline (empty if none was found),
+            bound is its suboptimality bound and search is the AnytimeSearch holding the search state so the path can
+            be refined later with search.improve() or search.improve_in_background()
+
+    shooter_wavefront and hazard_wavefront precompute edge_cost and escape_safety, so setting up the search only
+    looks them up. If they are missing (e.g. no hazards were placed) computing them counts against the deadline.
+    """
+    def anytime_escape_path(self, start, deadline_ms: float, epsilon: float = 3.0, epsilon_step: float = 0.5):
+        tic = time.perf_counter()
+        start_id = int(self.start_node_ids([start])[0])
+        search = AnytimeSearch(self, start_id, epsilon, epsilon_step)
+        if deadline_ms is not None:
+            deadline_ms = max(0.0, deadline_ms - (time.perf_counter() - tic) * 1000)
+        search.improve(deadline_ms)
+        return search.path, search.bound, search
+
+
+"""
+Anytime Repairing A* (ARA*) over the Safe* cost model.
+
+Safe* keeps away from hazards through its d_exit - safety priority rather than through its edge costs, so the cheapest
+path under next_cost alone can run straight past a hazard. The search therefore only enters cells whose safety is at
+least min_safety, the start's escape_safety: the safest any route from the start to an exit can be. Within those cells
+it looks for the path with the smallest next_cost, so the converged path is never closer to a hazard than the
+safest possible route, and so never closer than the one safest_escape_path takes.
+
+The search starts with an inflated heuristic (g + epsilon * h) to find a path quickly and then lowers epsilon after each
+completed iteration, reusing the OPEN/CLOSED/INCONS state instead of restarting. The Safe* heuristic (d_exit - safety)
+is not admissible, so the bound is computed with h = 0.75 * max(0, d_exit + safety - K), where K is the largest safety
+value at an exit. A step that lowers d_exit for free must raise safety by one, so d_exit + safety never drops along a
+0 cost edge, and every other step that lowers it costs at least 0.75 per unit. This keeps h consistent, which is what
+the ARA* bound needs. Weighted hazard safety (graph.unit_safety False) breaks that argument and h = 0 is used instead.
+
+path = list of node_ids from start to exit of the best path found so far ([] if none)
+bound = the best path's cost is at most bound times the cost of the cheapest path through cells with safety of at least
+        min_safety (inf if no path has been found yet)
+done = True once an iteration with epsilon = 1 has completed, i.e. the path is the cheapest such path
+"""
+class AnytimeSearch:
+    def __init__(self, graph: Graph, start_id: int, epsilon: float = 3.0, epsilon_step: float = 0.5):
+        self.graph = graph
+        self.start_id = start_id
+        self.epsilon = max(1.0, epsilon)
+        self.epsilon_step = epsilon_step
+        self.path = []
+        self.bound = float('inf')
+        self.done = False
+
+        if graph.edge_cost is None:
+            graph.edge_cost_update()
+        if graph.escape_safety is None:
+            graph.escape_safety_update()
+        self.min_safety = graph.escape_safety[start_id - 1]
+        exit_ids = [int(graph.grid[coords[0]][coords[1]]) for coords in graph.exits]
+        self._h_offset = max([graph.nodes[exit_id - 1].safety for exit_id in exit_ids if exit_id != 0], default=0)
+        self._g = {start_id: 0.0}
+        self._backpointer = {start_id: start_id}
+        # The exits are joined to a virtual goal by 0 cost edges, goal_g/goal_parent hold its cost and best exit
+        self._goal_g = float('inf')
+        self._goal_parent = 0
+        self._open = {start_id}
+        self._heap = [(self._key(start_id), start_id)]
+        self._closed = set()
+        self._incons = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _heuristic(self, node_id: int) -> float:
+        if not self.graph.unit_safety:
+            return 0
+        node = self.graph.nodes[node_id - 1]
+        return 0.75 * max(0, node.d_exit + node.safety - self._h_offset)
+
+    def _key(self, node_id: int) -> float:
+        return self._g[node_id] + self.epsilon * self._heuristic(node_id)
+
+    # Drop stale heap entries and return the smallest key in OPEN
+    def _min_key(self) -> float:
+        while self._heap:
+            key, node_id = self._heap[0]
+            if node_id in self._open and key == self._key(node_id):
+                return key
+            heapq.heappop(self._heap)
+        return float('inf')
+
+    """
+    Expand nodes until the goal's g is no larger than every key in OPEN. Returns False if the deadline (a
+    time.perf_counter() value or None) passed or a stop was requested first.
+    """
+    def _improve_path(self, deadline) -> bool:
+        nodes = self.graph.nodes
+        edge_offsets = self.graph.edge_offsets
+        edge_targets = self.graph.edge_targets
+        edge_cost = self.graph.edge_cost
+        while self._goal_g > self._min_key():
+            if self._stop.is_set() or (deadline is not None and time.perf_counter() > deadline):
+                return False
+            node_id = heapq.heappop(self._heap)[1]
+            self._open.discard(node_id)
+            self._closed.add(node_id)
+            node = nodes[node_id - 1]
+            g = self._g[node_id]
+
+            if node.d_exit == 0:
+                if g < self._goal_g:
+                    self._goal_g = g
+                    self._goal_parent = node_id
+                continue
+
+            first, last = edge_offsets[node_id - 1], edge_offsets[node_id]
+            for neighbor_id, cost in zip(edge_targets[first:last].tolist(), edge_cost[first:last].tolist()):
+                new_cost = g + cost
+                if nodes[neighbor_id - 1].safety < self.min_safety:
+                    continue
+                if new_cost < self._g.get(neighbor_id, float('inf')):
+                    self._g[neighbor_id] = new_cost
+                    self._backpointer[neighbor_id] = node_id
+                    if neighbor_id in self._closed:
+                        self._incons.add(neighbor_id)
+                    else:
+                        self._open.add(neighbor_id)
+                        heapq.heappush(self._heap, (self._key(neighbor_id), neighbor_id))
+        return True
+
+    # Rebuild the path from the backpointers and compute its suboptimality bound
+    def _publish(self, completed: bool):
+        if self._goal_g == float('inf'):
+            return
+        path = []
+        path_id = self._goal_parent
+        while path_id != self.start_id:
+            path.append(path_id)
+            path_id = self._backpointer[path_id]
+        path.append(self.start_id)
+        path.reverse()
+
+        lower = self._goal_g
+        for node_id in self._open | self._incons:
+            lower = min(lower, self._g[node_id] + self._heuristic(node_id))
+        if lower > 0:
+            bound = max(1.0, self._goal_g / lower)
+        else:
+            bound = 1.0 if self._goal_g == 0 else float('inf')
+        if completed:
+            bound = min(bound, self.epsilon)
+        self.path, self.bound = path, bound
+
+    """
+    Input: deadline in milliseconds, or None to run until the path is optimal or stop() is called
+    Output: (path, bound) for the best path found so far
+
+    With a deadline the call never waits on a background refinement: if improve_in_background() is running it returns
+    the path and bound that refinement has published so far.
+    """
+    def improve(self, deadline_ms=None):
+        deadline = None if deadline_ms is None else time.perf_counter() + deadline_ms / 1000
+        if not self._lock.acquire(blocking=deadline is None):
+            return self.path, self.bound
+        try:
+            while not self.done:
+                completed = self._improve_path(deadline)
+                self._publish(completed)
+                if not completed:
+                    break
+                if self.epsilon == 1.0:
+                    self.done = True
+                    break
+                # Lower epsilon, move INCONS into OPEN and re-key OPEN for the next iteration
+                self.epsilon = max(1.0, self.epsilon - self.epsilon_step)
+                self._open |= self._incons
+                self._incons = set()
+                self._closed = set()
+                self._heap = [(self._key(node_id), node_id) for node_id in self._open]
+                heapq.heapify(self._heap)
+        finally:
+            self._lock.release()
+        return self.path, self.bound
+
+    # Keep refining in a daemon thread until the path is optimal or stop() is called
+    def improve_in_background(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self.improve, daemon=True)
+        self._thread.start()
+
+    # Stop a background refinement and wait for it, later calls to improve() pick up from where it stopped
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self._stop.clear()
+
 
 """
 Inputs: integer for size of grid, list describing obstacle location and dimension (see * below)
@@ -277,6 +981,233 @@ def grid_construct(size, obstacles):
     return grid
 
 
+"""
+Inputs: compressed adjacency (edge_offsets, edge_targets) of a Graph, node_id of the wavefront source and an output
+        array with one entry per node
+Output: layer filled with the number of moves from the source to each node (sys.maxsize if it can't be reached)
+
+Breadth first wavefront that expands the whole frontier at once with NumPy gathers instead of one node at a time.
+"""
+def wavefront_layer(edge_offsets, edge_targets, source_id, layer):
+    layer[:] = sys.maxsize
+    layer[source_id - 1] = 0
+    frontier = np.array([source_id - 1])
+    distance = 0
+    while frontier.size:
+        distance += 1
+        starts = edge_offsets[frontier]
+        counts = edge_offsets[frontier + 1] - starts
+        # Index of every edge leaving the frontier, frontier node k owns edges starts[k]:starts[k]+counts[k]
+        edges = np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+        neighbors = edge_targets[edges] - 1
+        frontier = np.unique(neighbors[layer[neighbors] == sys.maxsize])
+        layer[frontier] = distance
+    return layer
+
+
+# Shared memory views for hazard_wavefront's worker processes, set up once per worker by _hazard_worker_init
+_hazard_shared = {}
+
+
+def _hazard_worker_init(adjacency_name, layers_name, n_nodes, n_edges, n_hazards):
+    adjacency = shared_memory.SharedMemory(name=adjacency_name)
+    layers = shared_memory.SharedMemory(name=layers_name)
+    shared_adjacency = np.ndarray((n_nodes + 1 + n_edges,), dtype=np.int32, buffer=adjacency.buf)
+    _hazard_shared['memory'] = (adjacency, layers)
+    _hazard_shared['edge_offsets'] = shared_adjacency[:n_nodes + 1]
+    _hazard_shared['edge_targets'] = shared_adjacency[n_nodes + 1:]
+    _hazard_shared['layers'] = np.ndarray((n_hazards, n_nodes), dtype=np.int64, buffer=layers.buf)
+
+
+def _hazard_worker(task):
+    row, hazard_id = task
+    wavefront_layer(_hazard_shared['edge_offsets'], _hazard_shared['edge_targets'], hazard_id,
+                    _hazard_shared['layers'][row])
+
+
+"""
+Inputs: d_exit and safety arrays for the start and end node of a batch of edges
+Output: float32 array with the next_cost value of each edge
+"""
+def next_cost_classes(curr_d_exit, curr_safety, next_d_exit, next_safety):
+    # Same cases, in the same order, as next_cost so that later cases take precedence
+    cost = np.full(len(curr_d_exit), 2.0, dtype=np.float32)
+    cost[(curr_safety < next_safety) & (curr_d_exit > next_d_exit)] = 0
+    cost[(curr_safety <= next_safety) & (curr_d_exit <= next_d_exit)] = 1
+    cost[(curr_safety > next_safety) & (curr_d_exit >= next_d_exit)] = 1.5
+    cost[(curr_safety > next_safety) & (curr_d_exit < next_d_exit)] = 2
+    return cost
+
+
+"""
+Inputs: (groups x exits) bool array telling which exits each group can reach, the number of occupants in each group and
+        the throughput of each exit
+Output: the smallest number of periods R such that every occupant can be assigned to a reachable exit with no exit
+        taking more than R times its throughput (at least 1)
+
+By the supply-demand theorem this holds exactly when, for every set S of exits, the occupants who can only reach exits
+in S number at least R times the throughput of S. Only unions of the groups' reachable sets need checking.
+"""
+def evacuation_rounds(reachable, supply, throughput):
+    reachable = np.asarray(reachable, dtype=bool)
+    supply = np.asarray(supply, dtype=np.int64)
+    throughput = np.asarray(throughput, dtype=np.int64).tolist()
+    occupied = supply > 0
+    if not occupied.any():
+        return 1
+    patterns, inverse = np.unique(reachable[occupied], axis=0, return_inverse=True)
+    counts = np.bincount(inverse.reshape(-1), weights=supply[occupied]).astype(np.int64).tolist()
+    masks = [sum(1 << e for e in np.flatnonzero(pattern).tolist()) for pattern in patterns]
+    if 0 in masks:
+        raise ValueError("some occupants cannot reach an exit")
+
+    unions = set(masks)
+    frontier = set(masks)
+    while frontier:
+        frontier = {a | b for a in frontier for b in masks} - unions
+        unions |= frontier
+
+    rounds = 1
+    for union in unions:
+        occupants = sum(count for mask, count in zip(masks, counts) if mask & ~union == 0)
+        capacity = sum(throughput[e] for e in range(len(throughput)) if union >> e & 1)
+        if capacity == 0:
+            raise ValueError("some occupants can only reach exits with no capacity")
+        rounds = max(rounds, -(-occupants // capacity))
+    return rounds
+
+
+"""
+Inputs: (groups x exits) array with the cost of sending one occupant of a group to an exit (inf if it can't reach it),
+        the number of occupants in each group and the capacity of each exit
+Output: (groups x exits) int array with the number of occupants of each group sent to each exit, with every occupant
+        assigned, no exit over capacity and the smallest total cost
+
+Successive shortest paths on the network source -> group -> exit -> sink. Because there are only a few exits the
+residual network is collapsed onto them: moving an occupant of group g from exit a to exit b costs
+cost[g, b] - cost[g, a], and the cheapest g for each (a, b) is kept at the top of a heap (stale entries are dropped
+when they reach the top). Each augmentation is a Bellman-Ford over the exits, seeded with the cheapest unassigned
+group for each exit, to the closest exit with spare capacity, and moves as many occupants as that path allows. The
+augmentations before the first exit fills up are all direct group -> cheapest exit paths and are done in bulk.
+"""
+def exit_assignment(cost, supply, capacity):
+    inf = float('inf')
+    cost = np.asarray(cost, dtype=float)
+    n_groups, n_exits = cost.shape
+    supply = np.asarray(supply, dtype=np.int64)
+    capacity = np.asarray(capacity, dtype=np.int64)
+    if supply.sum() > capacity.sum():
+        raise ValueError("exit capacities add up to " + str(capacity.sum()) + " for " + str(supply.sum()) +
+                         " occupants")
+
+    # Until the first exit fills up every shortest path is the direct one from the cheapest unassigned group to its
+    # cheapest exit, so that stretch of augmentations is done at once: groups in order of their cheapest cost go to
+    # their cheapest exit up to the first one that doesn't fit, which fills its exit with as many occupants as fit
+    direct = np.zeros((n_groups, n_exits), dtype=np.int64)
+    best = cost.argmin(axis=1)
+    best_cost = cost[np.arange(n_groups), best]
+    order = np.argsort(best_cost, kind='stable')
+    order = order[(supply[order] > 0) & (best_cost[order] < inf)]
+    load = np.zeros((len(order), n_exits), dtype=np.int64)
+    load[np.arange(len(order)), best[order]] = supply[order]
+    np.cumsum(load, axis=0, out=load)
+    overflow = np.flatnonzero((load > capacity).any(axis=1))
+    n_direct = overflow[0] if len(overflow) else len(order)
+    direct[order[:n_direct], best[order[:n_direct]]] = supply[order[:n_direct]]
+    if n_direct < len(order):
+        g = order[n_direct]
+        direct[g, best[g]] = capacity[best[g]] - direct[:, best[g]].sum()
+
+    costs = cost.tolist()
+    flow = direct.tolist()
+    remaining = (supply - direct.sum(axis=1)).tolist()
+    spare = (capacity - direct.sum(axis=0)).tolist()
+    left = sum(remaining)
+    # source[e] holds (cost, group) for groups with occupants left, exchange[a][b] holds (cost[g][b] - cost[g][a], g)
+    # for groups with occupants at exit a
+    source = []
+    for e in range(n_exits):
+        heap = [(row[e], g) for g, row in enumerate(costs) if row[e] < inf and remaining[g] > 0]
+        heapq.heapify(heap)
+        source.append(heap)
+    exchange = [[[] for _ in range(n_exits)] for _ in range(n_exits)]
+    for a in range(n_exits):
+        groups = np.flatnonzero(direct[:, a])
+        for b in range(n_exits):
+            if b != a:
+                moves = cost[groups, b] - cost[groups, a]
+                reachable = moves < inf
+                exchange[a][b] = list(zip(moves[reachable].tolist(), groups[reachable].tolist()))
+                heapq.heapify(exchange[a][b])
+
+    # top[a][b] is the valid top (cost, group) of exchange[a][b], (inf, -1) if there is none
+    def exchange_top(a):
+        row = []
+        for heap in exchange[a]:
+            while heap and flow[heap[0][1]][a] == 0:
+                heapq.heappop(heap)
+            row.append(heap[0] if heap else (inf, -1))
+        return row
+    top = [exchange_top(a) for a in range(n_exits)]
+
+    while left:
+        distance = [inf] * n_exits
+        previous = [None] * n_exits
+        for e in range(n_exits):
+            heap = source[e]
+            while heap and remaining[heap[0][1]] == 0:
+                heapq.heappop(heap)
+            if heap:
+                distance[e] = heap[0][0]
+                previous[e] = (-1, heap[0][1])
+        for _ in range(n_exits - 1):
+            updated = False
+            for a in range(n_exits):
+                if distance[a] == inf:
+                    continue
+                for b, (move_cost, g) in enumerate(top[a]):
+                    if distance[a] + move_cost < distance[b] - 1e-9:
+                        distance[b] = distance[a] + move_cost
+                        previous[b] = (a, g)
+                        updated = True
+            if not updated:
+                break
+
+        open_exits = [e for e in range(n_exits) if spare[e] > 0 and distance[e] < inf]
+        if not open_exits:
+            raise ValueError("some occupants cannot reach an exit with spare capacity")
+        sink = min(open_exits, key=distance.__getitem__)
+
+        # Walk the path back to the source as (from exit, group, to exit) moves, -1 being the source
+        moves = []
+        e = sink
+        while e != -1 and len(moves) <= n_exits:
+            a, g = previous[e]
+            moves.append((a, g, e))
+            e = a
+        amount = min([spare[sink]] + [remaining[g] if a == -1 else flow[g][a] for a, g, b in moves])
+
+        for a, g, b in moves:
+            if a == -1:
+                remaining[g] -= amount
+            else:
+                flow[g][a] -= amount
+            if flow[g][b] == 0:
+                for c in range(n_exits):
+                    if c != b and costs[g][c] < inf:
+                        heapq.heappush(exchange[b][c], (costs[g][c] - costs[g][b], g))
+            flow[g][b] += amount
+        spare[sink] -= amount
+        left -= amount
+        # Only moves out of an exit make exchange entries stale and only moves into one add entries
+        for a, g, b in moves:
+            if a != -1:
+                top[a] = exchange_top(a)
+            top[b] = exchange_top(b)
+
+    return np.array(flow, dtype=np.int64).reshape(n_groups, n_exits)
+
+
 # Determines that manhattan distance between two points on a grid where the points are a list of [x,y] coordinates
 def distance_manhattan(point1, point2):
     distance = abs(point1[0]-point2[0]) + abs(point1[1]-point2[1])
@@ -0,0 +1,117 @@
+import sys
+import json
+import time
+import argparse
+import numpy as np
+import graph
+
+"""
+Headless command line runner for Safe* and A* search.
+
+Runs the planners for every start in one or more scenario files and prints one JSON object per path (JSON Lines).
+pygame is only imported when --render is given.
+
+Usage:
+ python safestar.py scenarios/figure1.json scenarios/figure3.json --planner both
+ python safestar.py scenarios/figure3.json --render
+
+Scenario files are JSON objects with:
+ size: an integer for the (square) grid side length
+ obstacles: list of obstacles in the format (from top left)
+            [[topleftx, toplefty], verticalheightdown = int, horizontal_width_right = int]
+ exits: list of [x,y] coordinates of exit(s)
+ hazards: list of [x,y] coordinates of hazard(s)
+ weights: (optional) list with one weight per hazard, see Graph.hazard_wavefront
+ starts: list of [x,y] start coordinates
+ capacities: (optional) list with the throughput of each exit, the number of occupants it lets out per period. When
+             given the starts are spread over the exits with Graph.assign_exits and each path goes to its assigned
+             exit. A population larger than the total throughput is still assigned in full, over several periods.
+ description: (optional) free text
+"""
+
+PLANNERS = {'safestar': 'safestar', 'a_star': 'a_star', 'both': ('safestar', 'a_star')}
+
+
+def load_scenario(path: str) -> dict:
+    with open(path) as scenario_file:
+        scenario = json.load(scenario_file)
+    missing = [key for key in ('size', 'obstacles', 'exits', 'hazards', 'starts') if key not in scenario]
+    if missing:
+        raise ValueError(path + ": missing scenario field(s) " + ", ".join(missing))
+    scenario.setdefault('name', path)
+    return scenario
+
+
+"""
+Inputs: scenario dict from load_scenario and the number of processes for the hazard wavefront
+Output: a Graph with neighbors, d_exit and safety set up for the scenario's map, exits and hazards
+"""
+def build_graph(scenario: dict, processes: int = 1) -> graph.Graph:
+    planning_graph = graph.Graph(scenario['size'], scenario['obstacles'], scenario['exits'])
+    planning_graph.graph_initialize()
+    planning_graph.node_get_neighbors()
+    planning_graph.node_set_d_exit()
+    if scenario['hazards']:
+        planning_graph.hazard_wavefront(scenario['hazards'], scenario.get('weights'), processes)
+    return planning_graph
+
+
+"""
+Inputs: scenario dict, the planner(s) to run and the number of processes for the hazard wavefront
+Output: list of result dicts, one per start and planner, with the path as node_ids and as [x,y] coordinates, and
+        the assigned exit index when the scenario has capacities
+"""
+def run_scenario(scenario: dict, planners, processes: int = 1) -> list:
+    planning_graph = build_graph(scenario, processes)
+    starts = np.asarray(scenario['starts'], dtype=int).reshape(-1, 2)
+    exit_indices = None
+    if 'capacities' in scenario:
+        exit_indices = planning_graph.assign_exits(starts, scenario['capacities'])
+    results = []
+    for planner in planners:
+        tic = time.perf_counter()
+        values, offsets = planning_graph.batch_escape_paths(starts, planner, exit_indices)
+        toc = time.perf_counter()
+        for i, start in enumerate(starts.tolist()):
+            path = values[offsets[i]:offsets[i + 1]].tolist()
+            result = {'scenario': scenario['name'],
+                      'planner': planner,
+                      'start': start,
+                      'path': path,
+                      'coords': [planning_graph.nodes[node - 1].coords for node in path],
+                      'length': len(path),
+                      'batch_ms': round((toc - tic) * 1000, 3)}
+            if exit_indices is not None:
+                result['exit'] = int(exit_indices[i])
+            results.append(result)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run Safe* and/or A* search on scenario files.")
+    parser.add_argument('scenarios', nargs='+', help="scenario JSON file(s)")
+    parser.add_argument('--planner', choices=sorted(PLANNERS), default='both', help="planner(s) to run")
+    parser.add_argument('--processes', type=int, default=1,
+                        help="worker processes for the hazard wavefront (default 1)")
+    parser.add_argument('--render', action='store_true',
+                        help="draw the first start of the first scenario with pygame after printing the results")
+    args = parser.parse_args(argv)
+
+    planners = PLANNERS[args.planner]
+    planners = (planners,) if isinstance(planners, str) else planners
+    for path in args.scenarios:
+        try:
+            results = run_scenario(load_scenario(path), planners, args.processes)
+        except ValueError as error:
+            parser.error(path + ": " + str(error))
+        for result in results:
+            print(json.dumps(result))
+    sys.stdout.flush()
+
+    if args.render:
+        import draw_visualization
+        draw_visualization.show_scenario(load_scenario(args.scenarios[0]))
+
+
+if __name__ == '__main__':
+    main()
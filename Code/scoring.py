@@ -0,0 +1,61 @@
+import numpy as np
+
+"""
+Path exposure scoring for comparing Safe* and A* paths.
+
+Paths are given in the ragged form returned by Graph.batch_escape_paths: a flat array of node_ids (values) and an
+offsets array where path i is values[offsets[i]:offsets[i+1]]. The node fields come from Graph.node_arrays(), so
+every metric is a NumPy gather followed by a segmented reduction instead of a Python loop over graph.nodes.
+
+Usage:
+ values, offsets = planning_graph.batch_escape_paths(starts)
+ d_exit, safety = planning_graph.node_arrays()
+ scores = scoring.score_paths(values, offsets, safety, d_exit)
+"""
+
+
+"""
+Inputs: ragged paths (values, offsets), safety and d_exit arrays indexed by node_id-1 and the safety value at or below
+        which a node counts as near a hazard
+Output: dict of arrays with one entry per path:
+ length = number of nodes in the path
+ min_safety = smallest safety value along the path
+ exposure = cumulative exposure, the sum of 1 / (1 + safety) over the nodes of the path
+ near_hazard = number of nodes (time steps) spent with safety <= near
+ detour = moves taken beyond the start node's d_exit
+ reaches_exit = True if the last node is an exit
+Empty paths (no exit reachable) get length 0, NaN min_safety/exposure/detour and reaches_exit False.
+"""
+def score_paths(values, offsets, safety, d_exit, near: float = 2) -> dict:
+    values = np.asarray(values)
+    offsets = np.asarray(offsets)
+    safety = np.asarray(safety, dtype=float)
+    d_exit = np.asarray(d_exit, dtype=float)
+
+    length = np.diff(offsets)
+    n_paths = len(length)
+    # reduceat misbehaves on empty segments, so only reduce over the paths that have nodes
+    nonempty = length > 0
+    starts = offsets[:-1][nonempty]
+    ends = offsets[1:][nonempty] - 1
+
+    path_safety = safety[values - 1]
+
+    min_safety = np.full(n_paths, np.nan)
+    exposure = np.full(n_paths, np.nan)
+    near_hazard = np.zeros(n_paths, dtype=np.int64)
+    detour = np.full(n_paths, np.nan)
+    reaches_exit = np.zeros(n_paths, dtype=bool)
+    if len(values):
+        min_safety[nonempty] = np.minimum.reduceat(path_safety, starts)
+        exposure[nonempty] = np.add.reduceat(1.0 / (1.0 + path_safety), starts)
+        near_hazard[nonempty] = np.add.reduceat((path_safety <= near).astype(np.int64), starts)
+        detour[nonempty] = length[nonempty] - 1 - d_exit[values[starts] - 1]
+        reaches_exit[nonempty] = d_exit[values[ends] - 1] == 0
+
+    return {'length': length,
+            'min_safety': min_safety,
+            'exposure': exposure,
+            'near_hazard': near_hazard,
+            'detour': detour,
+            'reaches_exit': reaches_exit}